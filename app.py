@@ -1,13 +1,18 @@
 import streamlit as st
 import os
-import json
+import io
+import hashlib
+import logging
+import threading
+import time
 from datetime import datetime
+from textwrap import wrap
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import uuid4
+import diskcache
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, Process, LLM
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
+from utils import serialization
 
 # ==========================================
 # 1. SETUP & CONFIGURATION
@@ -15,6 +20,25 @@ from reportlab.lib.units import inch
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini/gemini-2.5-flash-lite"
+MAX_RESEARCH_TOKENS = 512  # the research report only needs ~300 words
+CACHE_TTL = 86400  # seconds
+MAX_CONCURRENT_CALLS = 8  # crew runs in flight across all sessions, for the Gemini rate limit
+
+# Disk layer so crew results survive Streamlit reruns and restarts
+CACHE_DIR = Path(".crew_cache")
+
+# Semantic layer: near-duplicate topics reuse an existing cache entry
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.92  # cosine similarity
+SEMANTIC_MAX_ENTRIES = 5000  # rows kept in the in-memory index
+SEMANTIC_PREFIX = "semantic:"  # diskcache key prefix for (model, vector, added_at) rows
+
+# Every generated infographic is appended here as one JSON file
+HISTORY_DIR = Path("history")
+
 st.set_page_config(page_title="AI Infographic Generator", layout="wide")
 
 # Custom CSS
@@ -35,30 +59,48 @@ st.markdown("""
 # 2. PDF GENERATION ENGINE
 # ==========================================
 
-def create_infographic_pdf(data, filename="infographic.pdf"):
+# Text styles as (font, size, fill colour). Colours are ReportLab colour
+# names so this module doesn't have to import ReportLab at load time.
+TITLE_STYLE = ("Helvetica-Bold", 30, "white")
+HEADING_STYLE = ("Helvetica-Bold", 16, "black")
+STAT_VALUE_STYLE = ("Helvetica-Bold", 20, "cornflowerblue")
+STAT_LABEL_STYLE = ("Helvetica", 10, "gray")
+BODY_STYLE = ("Helvetica", 11, "black")
+FACT_STYLE = ("Helvetica-Oblique", 11, "black")
+
+def _apply(c, style):
+    font, size, color = style
+    c.setFont(font, size)
+    c.setFillColor(color)
+
+def create_infographic_pdf(data) -> bytes:
     """
     Generates a visual PDF using ReportLab based on structured JSON.
+    Returns the PDF as bytes so nothing is written to disk.
     """
-    c = canvas.Canvas(filename, pagesize=A4)
+    # Imported lazily so the UI can render before ReportLab is loaded
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import inch
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
     width, height = A4
     
-    # Background
+    # Background & Header
     c.setFillColor(colors.whitesmoke)
     c.rect(0, 0, width, height, fill=1)
-    
-    # Header
     c.setFillColor(colors.cornflowerblue)
     c.rect(0, height - 1.5*inch, width, 1.5*inch, fill=1, stroke=0)
     
     # Title
-    c.setFillColor(colors.white)
-    c.setFont("Helvetica-Bold", 30)
+    _apply(c, TITLE_STYLE)
     c.drawCentredString(width/2, height - 1*inch, f"Infographic: {data.get('topic', 'Unknown Topic')}")
     
     # Stats Section
     y_pos = height - 2.5*inch
-    c.setFillColor(colors.black)
-    c.setFont("Helvetica-Bold", 16)
+    _apply(c, HEADING_STYLE)
     c.drawString(0.5*inch, y_pos, "Key Statistics")
     
     stats = data.get('stats', [])
@@ -71,76 +113,94 @@ def create_infographic_pdf(data, filename="infographic.pdf"):
         c.setFillColor(colors.white)
         c.roundRect(x_pos, box_y, box_width, 1.2*inch, 10, fill=1, stroke=0)
         
-        c.setFillColor(colors.cornflowerblue)
-        c.setFont("Helvetica-Bold", 20)
+        _apply(c, STAT_VALUE_STYLE)
         c.drawCentredString(x_pos + box_width/2, box_y + 0.7*inch, str(stat.get('value', '')))
         
-        c.setFillColor(colors.gray)
-        c.setFont("Helvetica", 10)
+        _apply(c, STAT_LABEL_STYLE)
         c.drawCentredString(x_pos + box_width/2, box_y + 0.4*inch, str(stat.get('label', '')))
 
     # Summary Section
     y_pos = box_y - 0.5*inch
-    c.setFillColor(colors.black)
-    c.setFont("Helvetica-Bold", 16)
+    _apply(c, HEADING_STYLE)
     c.drawString(0.5*inch, y_pos, "Executive Summary")
     
     y_pos -= 0.3*inch
-    c.setFont("Helvetica", 11)
     text_object = c.beginText(0.5*inch, y_pos)
-    text_object.setFont("Helvetica", 11)
+    text_object.setFont(BODY_STYLE[0], BODY_STYLE[1])
     text_object.setLeading(14)
     
     summary_text = data.get('summary', 'No summary available.')
-    words = summary_text.split()
-    line = []
-    for word in words:
-        line.append(word)
-        if len(" ".join(line)) > 80: 
-            text_object.textLine(" ".join(line))
-            line = []
-    text_object.textLine(" ".join(line))
+    for line in wrap(summary_text, width=80):
+        text_object.textLine(line)
     c.drawText(text_object)
     
     # Fun Fact
+    # Fill is still black from the summary heading, so only the font changes
     y_pos = text_object.getY() - 0.5*inch
-    c.setFillColor(colors.black)
-    c.setFont("Helvetica-Bold", 16)
+    c.setFont(*HEADING_STYLE[:2])
     c.drawString(0.5*inch, y_pos, "Did You Know?")
     
     y_pos -= 0.3*inch
-    c.setFont("Helvetica-Oblique", 11)
+    c.setFont(*FACT_STYLE[:2])
     c.drawString(0.5*inch, y_pos, f"• {data.get('fun_fact', '')}")
 
     c.save()
-    return filename
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=64, ttl=CACHE_TTL)
+def build_pdf(data_json: bytes) -> bytes:
+    """
+    Memoized create_infographic_pdf so Streamlit reruns reuse the same bytes.
+    Takes the data as sorted-key JSON bytes, which makes a stable cache key.
+    """
+    return create_infographic_pdf(serialization.loads(data_json))
 
 # ==========================================
 # 3. CREWAI BACKEND (FIXED)
 # ==========================================
 
-def run_crew_research(topic, api_key):
+RESEARCH_GOAL = "Uncover key statistics and facts about: {topic}"
+RESEARCH_DESCRIPTION = """
+        Research '{topic}'. Find:
+        1. Executive summary (max 150 words).
+        2. 3 numerical stats (e.g., "Market Cap: $1T").
+        3. One fun fact.
+        Keep the whole report under 300 words, with no prose outside these three sections.
+        """
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def build_crew(api_key, model=MODEL_NAME):
     """
-    Orchestrates the CrewAI Agents using the native LLM class.
+    Assembles the researcher/designer Crew once per (api_key, model).
+    The researcher's goal and task are topic-independent templates here;
+    crew_for_topic fills them in on a per-run copy.
     """
-    
-    # --- CRITICAL FIX: Set Env Var for CrewAI Native LLM ---
-    # CrewAI's 'LLM' class looks for GOOGLE_API_KEY in os.environ
-    os.environ["GOOGLE_API_KEY"] = api_key
+    # Imported lazily: crewai pulls in litellm and pydantic, which dominate
+    # cold start. The cache_resource above means this runs once per key.
+    from crewai import Agent, Task, Crew, Process, LLM
+    from utils.schema import Infographic
 
-    # 1. Define LLM using proper provider prefix 'gemini/'
-    gemini_llm = LLM(
-        model="gemini/gemini-2.5-flash",
-        temperature=0.5,
+    # 1. Define LLMs using proper provider prefix 'gemini/'
+    # Only the researcher is capped: the designer echoes the summary inside
+    # the schema, and CrewAI's JSON conversion fallback reuses its LLM
+    research_llm = LLM(
+        model=model,
+        temperature=0.2,
+        max_tokens=MAX_RESEARCH_TOKENS,
+        api_key=api_key
+    )
+    design_llm = LLM(
+        model=model,
+        temperature=0.2,
         api_key=api_key
     )
 
     # 2. Define Agents
     researcher = Agent(
         role='Senior Research Analyst',
-        goal=f'Uncover key statistics and facts about: {topic}',
+        goal=RESEARCH_GOAL,
         backstory="Expert researcher finding precise numbers.",
-        llm=gemini_llm,
+        llm=research_llm,
         verbose=True,
         allow_delegation=False
     )
@@ -149,21 +209,16 @@ def run_crew_research(topic, api_key):
         role='Information Architect',
         goal='Structure the research into valid JSON',
         backstory="You format raw research into strict JSON for app consumption.",
-        llm=gemini_llm,
+        llm=design_llm,
         verbose=True,
         allow_delegation=False
     )
 
     # 3. Define Tasks
     research_task = Task(
-        description=f"""
-        Research '{topic}'. Find:
-        1. Executive summary (max 150 words).
-        2. 3 numerical stats (e.g., "Market Cap: $1T").
-        3. One fun fact.
-        """,
+        description=RESEARCH_DESCRIPTION,
         agent=researcher,
-        expected_output="Text report with extensive report and summary, stats, and fact."
+        expected_output="Concise report with the summary, 3 stats, and fact."
     )
 
     design_task = Task(
@@ -179,23 +234,318 @@ def run_crew_research(topic, api_key):
         """,
         agent=designer,
         expected_output="Valid JSON string.",
-        context=[research_task]
+        context=[research_task],
+        # CrewAI coerces the reply into this schema; cached_crew_research
+        # rejects the run if that fails
+        output_json=Infographic
     )
 
-    # 4. Run Crew
-    crew = Crew(
+    # 4. Assemble Crew
+    return Crew(
         agents=[researcher, designer],
         tasks=[research_task, design_task],
         verbose=True,
         process=Process.sequential
     )
 
-    return crew.kickoff()
+def crew_for_topic(topic, api_key, model=MODEL_NAME, task_callback=None):
+    """
+    Returns a private copy of the cached crew bound to a topic.
+    Copying keeps concurrent sessions from mutating each other's tasks.
+    task_callback, if given, receives each TaskOutput as soon as that task finishes.
+    """
+    # --- CRITICAL FIX: Set Env Var for CrewAI Native LLM ---
+    # CrewAI's 'LLM' class looks for GOOGLE_API_KEY in os.environ
+    os.environ["GOOGLE_API_KEY"] = api_key
+
+    crew = build_crew(api_key, model).copy()
+    researcher, research_task = crew.agents[0], crew.tasks[0]
+    researcher.goal = RESEARCH_GOAL.format(topic=topic)
+    research_task.description = RESEARCH_DESCRIPTION.format(topic=topic)
+    crew.task_callback = task_callback
+    return crew
+
+def run_crew_research(topic, api_key, model=MODEL_NAME, task_callback=None):
+    """
+    Runs the crew and blocks until the designer has produced its JSON.
+    """
+    return crew_for_topic(topic, api_key, model, task_callback).kickoff()
+
+@st.cache_resource(show_spinner=False)
+def get_crew_cache():
+    """
+    Opens the crew result cache once per process rather than on every rerun.
+    """
+    return diskcache.Cache(str(CACHE_DIR))
+
+@st.cache_resource
+def get_crew_slots():
+    """
+    Process-wide semaphore shared by every session and batch worker.
+    """
+    return threading.BoundedSemaphore(MAX_CONCURRENT_CALLS)
+
+def normalize_topic(topic):
+    return topic.lower().strip()
+
+@st.cache_resource(show_spinner=False)
+def get_topic_encoder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_status():
+    """
+    Process-wide switch for the semantic layer. A plain module global would be
+    reset by every Streamlit rerun.
+    """
+    return {"disabled": False}
+
+def disable_semantic_cache(what):
+    status = get_semantic_status()
+    if not status["disabled"]:
+        status["disabled"] = True
+        logger.warning("Semantic cache %s failed; disabling it for this process", what, exc_info=True)
+
+def _build_semantic_index():
+    """
+    Rebuilds the FAISS index from the live semantic rows in diskcache.
+    Rows expire with the results they point at, so this also prunes stale
+    topics, and only the newest SEMANTIC_MAX_ENTRIES are kept.
+    """
+    import faiss
+    import numpy as np
+
+    crew_cache = get_crew_cache()
+    rows = []
+    for cache_key in list(crew_cache.iterkeys()):
+        if isinstance(cache_key, str) and cache_key.startswith(SEMANTIC_PREFIX):
+            row = crew_cache.get(cache_key)
+            if row is not None:
+                rows.append((cache_key[len(SEMANTIC_PREFIX):], *row))
+    rows.sort(key=lambda r: r[3], reverse=True)
+    rows = rows[:SEMANTIC_MAX_ENTRIES]
+
+    index = faiss.IndexFlatIP(get_topic_encoder().get_sentence_embedding_dimension())
+    if rows:
+        index.add(np.stack([vector for _, _, vector, _ in rows]))
+    entries = [(model, key) for key, model, _, _ in rows]
+    return index, entries
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_index():
+    """
+    Returns the shared semantic index state.
+    entries[i] is the (model, cache key) pair for row i of state["index"].
+    """
+    index, entries = _build_semantic_index()
+    return {"index": index, "entries": entries, "lock": threading.Lock()}
+
+def embed_topic(topic):
+    return get_topic_encoder().encode([topic], normalize_embeddings=True)
+
+def semantic_lookup(vector, model):
+    """
+    Returns (row, cache key) of the closest earlier topic, or None if nothing is similar enough.
+    """
+    state = get_semantic_index()
+    with state["lock"]:
+        index, entries = state["index"], state["entries"]
+        if index.ntotal == 0:
+            return None
+        scores, ids = index.search(vector, 1)
+        row = int(ids[0][0])
+        if not 0 <= row < len(entries):
+            return None
+        entry_model, key = entries[row]
+    if scores[0][0] > SEMANTIC_THRESHOLD and entry_model == model:
+        return row, key
+    return None
+
+def semantic_add(vector, model, key, row=None):
+    """
+    Indexes vector under key. If row is given (an expired match), that row is
+    repointed at key instead, so the stale entry doesn't shadow the new one.
+    Persisting is a single small diskcache write with the result's TTL.
+    """
+    get_crew_cache().set(SEMANTIC_PREFIX + key, (model, vector[0], time.time()), expire=CACHE_TTL)
+
+    state = get_semantic_index()
+    with state["lock"]:
+        if row is not None:
+            state["entries"][row] = (model, key)
+            return
+        state["index"].add(vector)
+        state["entries"].append((model, key))
+        if len(state["entries"]) > SEMANTIC_MAX_ENTRIES:
+            state["index"], state["entries"] = _build_semantic_index()
+
+def save_history(data):
+    """
+    Persists a freshly generated infographic as a timestamped JSON record.
+    History is a side record, so a failed write is logged rather than raised.
+    """
+    now = datetime.now()
+    # uuid suffix: batch workers can finish within the same microsecond
+    path = HISTORY_DIR / f"{now.strftime('%Y%m%dT%H%M%S%f')}_{uuid4().hex[:8]}.json"
+    record = {"generated_at": now.isoformat(), **data}
+    try:
+        HISTORY_DIR.mkdir(exist_ok=True)
+        path.write_bytes(serialization.dumps(record, append_newline=True))
+    except Exception:
+        logger.warning("Could not write history record %s", path, exc_info=True)
+        return None
+    return path
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_crew_research(topic: str, model: str, _api_key: str, _progress: list | None = None) -> str:
+    """
+    Returns the raw crew output for a topic, served from cache when possible.
+    The leading underscores keep the API key and progress list out of Streamlit's cache key.
+    On a miss, each finished task's output is appended to _progress as it completes.
+    """
+    # Only the cache key is normalized; the crew researches the topic as typed
+    # so acronyms and proper nouns ("WHO", "US Open") keep their meaning
+    topic = topic.strip()
+    cache_topic = normalize_topic(topic)
+    key = hashlib.sha256((cache_topic + model).encode("utf-8")).hexdigest()
+    crew_cache = get_crew_cache()
+
+    cached = crew_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # The semantic layer is best-effort: if the encoder or index is unavailable,
+    # fall through to running the crew
+    vector, match = None, None
+    if not get_semantic_status()["disabled"]:
+        try:
+            vector = embed_topic(cache_topic)
+            match = semantic_lookup(vector, model)
+        except Exception:
+            vector = None
+            disable_semantic_cache("lookup")
+    if match is not None:
+        # The entry may have expired since it was indexed
+        cached = crew_cache.get(match[1])
+        if cached is not None:
+            return cached
+
+    task_callback = _progress.append if _progress is not None else None
+    from utils.schema import Infographic
+
+    with get_crew_slots():
+        crew_output = run_crew_research(topic, _api_key, model, task_callback)
+    # CrewAI only warns when it can't coerce the reply into the schema, leaving
+    # json_dict as None. Raise before caching so the failure isn't served for a TTL.
+    if crew_output.json_dict is None:
+        raise ValueError(f"Designer did not return infographic JSON: {crew_output.raw[:200]}")
+    infographic = Infographic.model_validate(crew_output.json_dict)
+    result = infographic.model_dump_json()
+    crew_cache.set(key, result, expire=CACHE_TTL)
+    # Only cache misses reach here, so repeat views don't add records
+    save_history(infographic.model_dump())
+    if vector is not None and not get_semantic_status()["disabled"]:
+        try:
+            semantic_add(vector, model, key, row=match[0] if match else None)
+        except Exception:
+            disable_semantic_cache("update")
+    return result
 
 # ==========================================
 # 4. STREAMLIT FRONTEND
 # ==========================================
 
+@st.cache_resource
+def get_executor():
+    """
+    Process-wide worker pool so crew runs don't block the script thread.
+    """
+    return ThreadPoolExecutor(max_workers=4)
+
+def generate_infographic(topic, api_key, model=MODEL_NAME) -> bytes:
+    """
+    Researches a single topic end-to-end and returns its PDF.
+    """
+    data = serialization.loads(cached_crew_research(topic, model, api_key))
+    return build_pdf(serialization.dumps(data, sort_keys=True))
+
+def _generate_or_error(topic, api_key):
+    try:
+        return generate_infographic(topic, api_key), None
+    except Exception as e:
+        return None, str(e)
+
+def generate_batch(topics: list[str], api_key) -> list[tuple[bytes | None, str | None]]:
+    """
+    Generates one PDF per topic in parallel, in the same order as topics.
+    Each entry is (pdf_bytes, None) on success or (None, error) on failure,
+    so one bad topic doesn't discard the rest. Concurrent Gemini calls are
+    bounded process-wide by get_crew_slots().
+    """
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_CALLS, len(topics))) as pool:
+        return list(pool.map(lambda t: _generate_or_error(t, api_key), topics))
+
+def render_infographic(data, topic):
+    st.success("Success!")
+    st.markdown(f"## 📊 {data.get('topic', topic)}")
+    st.info(data.get('summary'))
+
+    cols = st.columns(3)
+    stats = data.get('stats', [])
+    for i, stat in enumerate(stats):
+        if i < 3:
+            cols[i].metric(label=stat.get('label'), value=stat.get('value'))
+
+    st.warning(f"Did you know? {data.get('fun_fact')}")
+
+    # PDF
+    pdf_bytes = build_pdf(serialization.dumps(data, sort_keys=True))
+    st.download_button(
+        label="Download PDF",
+        data=pdf_bytes,
+        file_name=f"{topic}_infographic.pdf",
+        mime="application/pdf"
+    )
+
+@st.fragment(run_every=0.5)
+def poll_research():
+    """
+    Checks on the background crew run without rerunning the whole page.
+    Once the run finishes, the result is stored and the app reruns to show it.
+    """
+    future = st.session_state.get("future")
+    if future is None:
+        return
+
+    if not future.done():
+        progress = st.session_state.get("progress")
+        if progress:
+            # Worker threads can't touch the UI, so show what the crew has
+            # appended so far: the research report while the designer runs
+            st.info("🎨 Research done, designing the infographic...")
+            st.markdown(progress[0].raw)
+        else:
+            st.info("🤖 Researching & Designing...")
+        # A started crew can't be interrupted, so Cancel is only offered while
+        # the run is still queued; otherwise it stays tracked until it finishes
+        if not future.running() and st.button("Cancel") and future.cancel():
+            del st.session_state["future"]
+            st.rerun()
+        return
+
+    del st.session_state["future"]
+    try:
+        if "batch_topics" in st.session_state:
+            st.session_state["batch_pdfs"] = future.result()
+        else:
+            st.session_state["infographic"] = serialization.loads(future.result())
+    except Exception as e:
+        # Error handling fixed: removed reference to 'crew_output' 
+        # because it doesn't exist if the crew failed.
+        st.session_state["error"] = str(e)
+    st.rerun()
+
 def main():
     st.sidebar.title("Configuration")
     
@@ -203,57 +553,60 @@ def main():
     env_api_key = os.getenv("GOOGLE_API_KEY") or ""
     api_key = st.sidebar.text_input("Gemini API Key", value=env_api_key, type="password")
 
+    batch_mode = st.sidebar.toggle("Batch mode")
+
     st.title("🎨 AI Infographic Generator")
-    topic = st.text_input("Enter a topic (e.g., 'SpaceX', 'Bitcoin', 'Climate Change')")
+    if batch_mode:
+        topics_text = st.text_area("Enter one topic per line")
+        topics = [t.strip() for t in topics_text.splitlines() if t.strip()]
+        topic = topics[0] if topics else ""
+    else:
+        topic = st.text_input("Enter a topic (e.g., 'SpaceX', 'Bitcoin', 'Climate Change')")
 
-    if st.button("Generate Infographic"):
+    if st.button("Generate Infographic", disabled="future" in st.session_state):
         if not api_key:
             st.error("Please enter your API Key.")
         elif not topic:
             st.warning("Please enter a topic.")
         else:
-            with st.spinner('🤖 Researching & Designing...'):
-                try:
-                    # Run Crew
-                    crew_output = run_crew_research(topic, api_key)
-                    
-                    # Clean JSON
-                    raw_json = str(crew_output).strip()
-                    if "```json" in raw_json:
-                        raw_json = raw_json.split("```json")[1].split("```")[0]
-                    elif "```" in raw_json:
-                        raw_json = raw_json.split("```")[1].split("```")[0]
-                    
-                    data = json.loads(raw_json)
-
-                    # Display
-                    st.success("Success!")
-                    st.markdown(f"## 📊 {data.get('topic', topic)}")
-                    st.info(data.get('summary'))
-
-                    cols = st.columns(3)
-                    stats = data.get('stats', [])
-                    for i, stat in enumerate(stats):
-                        if i < 3:
-                            cols[i].metric(label=stat.get('label'), value=stat.get('value'))
-
-                    st.warning(f"Did you know? {data.get('fun_fact')}")
-
-                    # PDF
-                    pdf_file = create_infographic_pdf(data)
-                    with open(pdf_file, "rb") as f:
-                        st.download_button(
-                            label="Download PDF",
-                            data=f,
-                            file_name=f"{topic}_infographic.pdf",
-                            mime="application/pdf"
-                        )
-
-                except Exception as e:
-                    # Error handling fixed: removed reference to 'crew_output' 
-                    # because it doesn't exist if the crew failed.
-                    st.error(f"Error: {str(e)}")
-                    st.warning("If you get a 404 error, check your API Key permissions or try using model='gemini/gemini-1.5-flash-latest' in app.py")
+            for key in ("infographic", "error", "batch_topics", "batch_pdfs", "progress"):
+                st.session_state.pop(key, None)
+            if batch_mode:
+                st.session_state["batch_topics"] = topics
+                st.session_state["future"] = get_executor().submit(generate_batch, topics, api_key)
+            else:
+                st.session_state["topic"] = topic
+                st.session_state["progress"] = []
+                st.session_state["future"] = get_executor().submit(
+                    cached_crew_research, topic, MODEL_NAME, api_key,
+                    st.session_state["progress"]
+                )
+            # Full rerun so the button renders disabled while the fragment polls
+            st.rerun()
+
+    if "future" in st.session_state:
+        poll_research()
+
+    if "error" in st.session_state:
+        st.error(f"Error: {st.session_state['error']}")
+        st.warning("If you get a 404 error, check your API Key permissions or try using model='gemini/gemini-1.5-flash-latest' in app.py")
+    elif "batch_pdfs" in st.session_state:
+        results = st.session_state["batch_pdfs"]
+        done = sum(1 for pdf_bytes, _ in results if pdf_bytes is not None)
+        st.success(f"Generated {done} of {len(results)} infographics!")
+        for i, (t, (pdf_bytes, error)) in enumerate(zip(st.session_state["batch_topics"], results)):
+            if error is not None:
+                st.error(f"{t}: {error}")
+                continue
+            st.download_button(
+                label=f"Download {t} PDF",
+                data=pdf_bytes,
+                file_name=f"{t}_infographic.pdf",
+                mime="application/pdf",
+                key=f"batch_{i}"
+            )
+    elif "infographic" in st.session_state:
+        render_infographic(st.session_state["infographic"], st.session_state["topic"])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,17 @@
+"""
+Structured output schema the designer agent must return.
+"""
+
+from pydantic import BaseModel
+
+
+class Stat(BaseModel):
+    label: str
+    value: str
+
+
+class Infographic(BaseModel):
+    topic: str
+    summary: str
+    stats: list[Stat]
+    fun_fact: str
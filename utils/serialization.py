@@ -0,0 +1,34 @@
+"""
+JSON helpers. Uses orjson when it is installed and falls back to the stdlib.
+"""
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+HAS_ORJSON = _json.__name__ == "orjson"
+
+
+def loads(raw):
+    """
+    Parses a JSON document from str or bytes.
+    """
+    return _json.loads(raw)
+
+
+def dumps(obj, sort_keys=False, append_newline=False):
+    """
+    Serializes obj to UTF-8 encoded JSON bytes.
+    """
+    if HAS_ORJSON:
+        option = 0
+        if sort_keys:
+            option |= _json.OPT_SORT_KEYS
+        if append_newline:
+            option |= _json.OPT_APPEND_NEWLINE
+        return _json.dumps(obj, option=option)
+    out = _json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False)
+    if append_newline:
+        out += "\n"
+    return out.encode("utf-8")